@@ -1,22 +1,155 @@
 import os
-import hashlib
 import struct
 import logging
-from datetime import datetime
-from collections import namedtuple
+from array import array
+from collections import deque
+from collections.abc import Sequence
+from functools import lru_cache
 import magic  # for file type detection
 import pyewf  # for E01 image support
 import pytsk3  # for file system analysis
+from carving import CARVE_MAX_FILE_SIZE, find_signature
+from forensix_common import DiskImageAnalyzer, FileEntry, advise_sequential, open_sequential
+
+try:
+    import numpy as np  # optional, sorts large timelines in C
+except ImportError:
+    np = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-FileEntry = namedtuple('FileEntry', ['name', 'path', 'size', 'created', 'modified', 'accessed', 'file_type'])
+COPY_CHUNK_SIZE = 16 * 1024 * 1024  # 16MB per copy call when creating images
+PROGRESS_LOG_INTERVAL = 10000  # files between progress lines while walking a file system
+MAGIC_SAMPLE_SIZE = 1024  # bytes of file content handed to libmagic
+MAGIC_CACHE_SIZE = 4096  # recent distinct samples whose libmagic type is remembered
+NON_CONTENT_MIME_TYPES = {
+    pytsk3.TSK_FS_META_TYPE_DIR: "inode/directory",
+    pytsk3.TSK_FS_META_TYPE_LNK: "inode/symlink",
+}
+FILE_TYPE_BATCH_SIZE = 4096  # files whose headers are sampled together in on-disk order
+
+
+def _prefetch(fd, offset, length):
+    if hasattr(os, 'posix_fadvise'):
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+
+
+def _drop_cached(fd):
+    # Written image data is not read again here, keep it from evicting useful cache
+    if hasattr(os, 'posix_fadvise'):
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def _metadata_file_type(meta):
+    # Types that follow from TSK metadata alone; None when the content has to be sampled
+    if meta.type in NON_CONTENT_MIME_TYPES:
+        return NON_CONTENT_MIME_TYPES[meta.type]
+    if meta.size == 0:
+        return "application/x-empty"
+    return None
+
+
+def _first_data_block(entry):
+    # First block of the file's first non-resident attribute, 0 for resident or unreadable data
+    try:
+        for attribute in entry:
+            for run in attribute:
+                return run.addr
+    except Exception:
+        pass
+    return 0
+
+
+def _inode_order(entry):
+    # Unallocated names without metadata sort after everything else
+    meta = entry.info.meta
+    return (meta is None, meta.addr if meta else 0)
+
+
+class FileTable:
+    # Column-oriented file metadata; FileEntry rows are only built when indexed
+    def __init__(self):
+        self.names = []
+        self.paths = []
+        self.sizes = array('q')
+        self.crtimes = array('q')
+        self.mtimes = array('q')
+        self.atimes = array('q')
+        self.file_types = []
+
+    def append(self, name, path, size, crtime, mtime, atime, file_type):
+        self.names.append(name)
+        self.paths.append(path)
+        self.sizes.append(size)
+        self.crtimes.append(crtime)
+        self.mtimes.append(mtime)
+        self.atimes.append(atime)
+        self.file_types.append(file_type)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        return FileEntry(
+            name=self.names[index],
+            path=self.paths[index],
+            size=self.sizes[index],
+            created_ts=self.crtimes[index],
+            modified_ts=self.mtimes[index],
+            accessed_ts=self.atimes[index],
+            file_type=self.file_types[index]
+        )
+
+
+class Timeline(Sequence):
+    # Created/modified/accessed timestamps stored three per file in one column;
+    # (timestamp, action, path) rows are produced in time order only when read,
+    # ties keeping file then action order. Slices come back as lists of rows.
+    ACTIONS = ('Created', 'Modified', 'Accessed')
+
+    def __init__(self):
+        self.paths = []
+        self.timestamps = array('q')
+        self._order = None
+
+    def append(self, path, crtime, mtime, atime):
+        self.paths.append(path)
+        self.timestamps.extend((crtime, mtime, atime))
+        self._order = None
+
+    def _sorted_order(self):
+        if self._order is None:
+            if np is not None:
+                self._order = np.argsort(np.frombuffer(self.timestamps, dtype=np.int64), kind='stable')
+            else:
+                self._order = array('q', sorted(range(len(self.timestamps)), key=self.timestamps.__getitem__))
+        return self._order
+
+    def _row(self, event):
+        file_index, action = divmod(int(event), len(self.ACTIONS))
+        return (self.timestamps[int(event)], self.ACTIONS[action], self.paths[file_index])
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(event) for event in self._sorted_order()[index]]
+        return self._row(self._sorted_order()[index])
+
+    def __iter__(self):
+        return map(self._row, self._sorted_order())
+
 
-class AdvancedFTKImager:
+class AdvancedFTKImager(DiskImageAnalyzer):
     def __init__(self):
-        self.image = None
-        self.filesystem = None
+        super().__init__()
+        self._magic = magic.Magic(mime=True)
+        # libmagic looks past the header, so only an identical sample can reuse a type; the
+        # cache holds at most MAGIC_CACHE_SIZE samples, evicting the least recently used
+        self._magic_from_buffer = lru_cache(maxsize=MAGIC_CACHE_SIZE)(self._magic.from_buffer)
 
     def create_disk_image(self, source_path, output_path, format='raw'):
         logger.info(f"Creating disk image of {source_path}")
@@ -28,92 +161,142 @@ class AdvancedFTKImager:
             raise ValueError("Unsupported image format")
         
         self.image = output_path
+        self.image_path = output_path
+        self._cached_hash.clear()
         logger.info(f"Disk image created: {output_path}")
 
     def _create_raw_image(self, source_path, output_path):
-        with open(source_path, 'rb') as source, open(output_path, 'wb') as output:
-            while True:
-                chunk = source.read(1024 * 1024)  # Read 1MB at a time
-                if not chunk:
-                    break
-                output.write(chunk)
+        with open(source_path, 'rb', opener=open_sequential) as source, open(output_path, 'wb') as output:
+            advise_sequential(source.fileno())
+            offset = 0
+            try:
+                # Let the kernel move the data instead of copying it through Python bytes
+                while True:
+                    _prefetch(source.fileno(), offset + COPY_CHUNK_SIZE, COPY_CHUNK_SIZE)
+                    sent = os.sendfile(output.fileno(), source.fileno(), offset, COPY_CHUNK_SIZE)
+                    if not sent:
+                        break
+                    offset += sent
+            except (AttributeError, OSError):
+                logger.debug("sendfile unavailable, falling back to buffered copy")
+                source.seek(offset)
+                output.seek(offset)
+                buffer = bytearray(COPY_CHUNK_SIZE)
+                with memoryview(buffer) as view:
+                    while True:
+                        bytes_read = source.readinto(buffer)
+                        if not bytes_read:
+                            break
+                        output.write(view[:bytes_read])
+
+            output.flush()
+            _drop_cached(output.fileno())
 
     def _create_e01_image(self, source_path, output_path):
         ewf_handle = pyewf.handle()
         ewf_handle.create(output_path)
         
-        with open(source_path, 'rb') as source:
+        with open(source_path, 'rb', opener=open_sequential) as source:
+            advise_sequential(source.fileno())
+            offset = 0
             while True:
-                chunk = source.read(1024 * 1024)  # Read 1MB at a time
+                _prefetch(source.fileno(), offset + COPY_CHUNK_SIZE, COPY_CHUNK_SIZE)
+                chunk = source.read(COPY_CHUNK_SIZE)
                 if not chunk:
                     break
                 ewf_handle.write(chunk)
+                offset += len(chunk)
         
         ewf_handle.close()
 
-    def load_image(self, image_path):
-        logger.info(f"Loading image: {image_path}")
-        self.image = pytsk3.Img_Info(image_path)
-        self.filesystem = pytsk3.FS_Info(self.image)
-
     def analyze_file_system(self):
         if not self.filesystem:
             logger.error("No filesystem loaded. Please load an image first.")
             return
 
         logger.info("Analyzing file system")
-        root_dir = self.filesystem.open_dir(path="/")
-        self._recurse_files(root_dir, "/")
-
-    def _recurse_files(self, directory, path):
-        for entry in directory:
+        files = FileTable()
+        pending_types = []
+        log_each_file = logger.isEnabledFor(logging.DEBUG)
+        for entry, file_name, file_path in self._walk_file_system():
+            meta = entry.info.meta
+            if not meta:
+                continue
             try:
-                file_name = entry.info.name.name.decode('utf8')
-                file_path = os.path.join(path, file_name)
-                
-                if entry.info.meta:
-                    file_type = self._get_file_type(entry)
-                    created = datetime.fromtimestamp(entry.info.meta.crtime)
-                    modified = datetime.fromtimestamp(entry.info.meta.mtime)
-                    accessed = datetime.fromtimestamp(entry.info.meta.atime)
-                    
-                    file_entry = FileEntry(
-                        name=file_name,
-                        path=file_path,
-                        size=entry.info.meta.size,
-                        created=created,
-                        modified=modified,
-                        accessed=accessed,
-                        file_type=file_type
-                    )
-                    
-                    logger.info(f"Found: {file_entry}")
-                
-                if entry.info.name.type == pytsk3.TSK_FS_NAME_TYPE_DIR:
-                    sub_directory = self.filesystem.open_dir(path=file_path)
-                    self._recurse_files(sub_directory, file_path)
-            
+                file_type = _metadata_file_type(meta)
+                files.append(file_name, file_path, meta.size, meta.crtime, meta.mtime, meta.atime, file_type)
             except Exception as e:
                 logger.error(f"Error processing {file_path}: {str(e)}")
+                continue
+
+            # Content sampling is deferred so a whole batch can be read in on-disk order
+            if file_type is None:
+                pending_types.append((_first_data_block(entry), len(files) - 1, entry))
+                if len(pending_types) >= FILE_TYPE_BATCH_SIZE:
+                    self._resolve_file_types(files, pending_types)
+
+            if log_each_file:
+                logger.debug(f"Found: {file_path}")
+            if len(files) % PROGRESS_LOG_INTERVAL == 0:
+                logger.info(f"Processed {len(files)} files")
+
+        self._resolve_file_types(files, pending_types)
+        logger.info(f"Found {len(files)} files")
+        return files
+
+    def _resolve_file_types(self, files, pending_types):
+        # Sorting by first data block keeps TSK's reads moving forward through the image
+        pending_types.sort(key=lambda pending: pending[0])
+        for _, index, entry in pending_types:
+            files.file_types[index] = self._sample_file_type(entry)
+        pending_types.clear()
+
+    def _walk_file_system(self):
+        # Breadth-first walk with an explicit queue instead of a stack frame per directory.
+        # Directories are opened by inode so TSK does not resolve their path again, and
+        # entries are visited in inode order to keep metadata and content reads close on disk.
+        # Each directory inode is queued once, so corrupt or looping directory links terminate
+        root_inum = self.filesystem.info.root_inum
+        pending = deque([(root_inum, "/")])
+        seen = {root_inum}
+        while pending:
+            inode, path = pending.popleft()
+            try:
+                entries = sorted(self.filesystem.open_dir(inode=inode), key=_inode_order)
+            except Exception as e:
+                logger.error(f"Error processing {path}: {str(e)}")
+                continue
+
+            for entry in entries:
+                file_path = path
+                try:
+                    file_name = entry.info.name.name.decode('utf8')
+                    if file_name in ('.', '..'):
+                        continue
+                    file_path = os.path.join(path, file_name)
+                    if entry.info.name.type == pytsk3.TSK_FS_NAME_TYPE_DIR and entry.info.meta:
+                        if entry.info.meta.addr not in seen:
+                            seen.add(entry.info.meta.addr)
+                            pending.append((entry.info.meta.addr, file_path))
+                except Exception as e:
+                    logger.error(f"Error processing {file_path}: {str(e)}")
+                    continue
+
+                yield entry, file_name, file_path
 
     def _get_file_type(self, entry):
+        file_type = _metadata_file_type(entry.info.meta)
+        if file_type is not None:
+            return file_type
+        return self._sample_file_type(entry)
+
+    def _sample_file_type(self, entry):
         try:
-            file_data = entry.read_random(0, min(entry.info.meta.size, 1024))
-            return magic.from_buffer(file_data, mime=True)
+            file_data = entry.read_random(0, min(entry.info.meta.size, MAGIC_SAMPLE_SIZE))
+            return self._magic_from_buffer(file_data)
         except:
             return "unknown"
 
-    def calculate_hash(self, algorithm='sha256'):
-        if not self.image:
-            logger.error("No disk image loaded. Please create or load an image first.")
-            return
-
-        logger.info(f"Calculating {algorithm} hash")
-        hash_obj = hashlib.new(algorithm)
-        for chunk in iter(lambda: self.image.read(1024 * 1024), b""):
-            hash_obj.update(chunk)
-        return hash_obj.hexdigest()
-
     def extract_metadata(self, file_path):
         logger.info(f"Extracting metadata for {file_path}")
         file_object = self.filesystem.open(file_path)
@@ -123,72 +306,43 @@ class AdvancedFTKImager:
             name=os.path.basename(file_path),
             path=file_path,
             size=meta.size,
-            created=datetime.fromtimestamp(meta.crtime),
-            modified=datetime.fromtimestamp(meta.mtime),
-            accessed=datetime.fromtimestamp(meta.atime),
+            created_ts=meta.crtime,
+            modified_ts=meta.mtime,
+            accessed_ts=meta.atime,
             file_type=self._get_file_type(file_object)
         )
 
     def file_carving(self, file_signature):
         logger.info(f"Carving files with signature: {file_signature.hex()}")
         carved_files = []
-        
-        chunk_size = 512
-        offset = 0
-        
-        while True:
-            chunk = self.image.read(offset, chunk_size)
-            if not chunk:
-                break
-            
-            if file_signature in chunk:
-                file_start = offset + chunk.index(file_signature)
-                carved_file = self._extract_carved_file(file_start, file_signature)
-                if carved_file:
-                    carved_files.append(carved_file)
-            
-            offset += chunk_size
+
+        # Each window carries enough of the following media to finish a file that starts in it
+        for _, media, scan_length in self._media_windows(overlap=CARVE_MAX_FILE_SIZE):
+            for file_start in self._find_signature_offsets(media, file_signature, scan_length):
+                carved_file = self._extract_carved_file(media, file_start, file_signature)
+                if carved_file is not None:
+                    with carved_file:
+                        carved_files.append(bytes(carved_file))
 
         return carved_files
 
-    def _extract_carved_file(self, start_offset, signature):
-        # This is a simplified carving process. In reality, you'd need to implement
-        # file-specific carving techniques for each file type.
-        max_file_size = 10 * 1024 * 1024  # 10 MB max file size for this example
-        
-        file_data = self.image.read(start_offset, max_file_size)
-        end_offset = file_data.find(b'\xFF\xD9')  # Example: JPEG end marker
-        
-        if end_offset != -1:
-            return file_data[:end_offset + 2]
-        return None
+    def _find_signature_offsets(self, media, file_signature, scan_length):
+        # Collecting hits up front keeps the scan free of extraction work
+        offsets = array('q')
+        offset = find_signature(media, file_signature, 0)
+        while offset != -1 and offset < scan_length:
+            offsets.append(offset)
+            offset = find_signature(media, file_signature, offset + 1)
+        return offsets
 
     def timeline_analysis(self):
         logger.info("Performing timeline analysis")
-        timeline = []
-        root_dir = self.filesystem.open_dir(path="/")
-        self._recurse_timeline(root_dir, "/", timeline)
-        return sorted(timeline, key=lambda x: x[0])  # Sort by timestamp
-
-    def _recurse_timeline(self, directory, path, timeline):
-        for entry in directory:
-            try:
-                file_name = entry.info.name.name.decode('utf8')
-                file_path = os.path.join(path, file_name)
-                
-                if entry.info.meta:
-                    timeline.extend([
-                        (entry.info.meta.crtime, 'Created', file_path),
-                        (entry.info.meta.mtime, 'Modified', file_path),
-                        (entry.info.meta.atime, 'Accessed', file_path),
-                    ])
-                
-                if entry.info.name.type == pytsk3.TSK_FS_NAME_TYPE_DIR:
-                    sub_directory = self.filesystem.open_dir(path=file_path)
-                    self._recurse_timeline(sub_directory, file_path, timeline)
-            
-            except Exception as e:
-                logger.error(f"Error processing {file_path}: {str(e)}")
+        timeline = Timeline()
+        for entry, _, file_path in self._walk_file_system():
+            meta = entry.info.meta
+            if meta:
+                timeline.append(file_path, meta.crtime, meta.mtime, meta.atime)
+        return timeline
 
 # Usage example
 imager = AdvancedFTKImager()
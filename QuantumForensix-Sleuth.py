@@ -6,128 +6,484 @@ import tempfile
 import subprocess
 import json
 from datetime import datetime
-from collections import namedtuple
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache, partial
+from typing import List, Dict, Any, Tuple
 import magic
 import pyewf
 import pytsk3
 import yara
-from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from carving import CARVE_MAX_FILE_SIZE, find_signatures
+from forensix_common import DiskImageAnalyzer, FileEntry, TREE_HASH_PREFIX
+
+try:
+    import cupy as cp  # optional, enables GPU file carving
+    import numpy as np
+except ImportError:
+    cp = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-FileEntry = namedtuple('FileEntry', ['name', 'path', 'size', 'created', 'modified', 'accessed', 'file_type'])
+DIGEST_ALGORITHMS = {32: 'md5', 40: 'sha1', 64: 'sha256', 128: 'sha512'}  # hex digest length -> algorithm
+ENCRYPTION_BLOCK_SIZE = 8 * 1024 * 1024  # 8MB of plaintext per AES-GCM record in secure_image
+YARA_SCAN_TIMEOUT = 60 * 60  # seconds before libyara aborts a scan
+YARA_TILE_SIZE = 8 * 1024 * 1024  # bytes per YARA scan, sized to stay within L2/L3 alongside rule state
+YARA_TILE_OVERLAP = 64 * 1024  # extra bytes per tile so strings spanning a tile boundary still match
+YARA_MAX_THREADS = min(32, os.cpu_count() or 1)  # libyara supports at most 32 concurrent scans
+GPU_TILE_SIZE = 256 * 1024 * 1024  # 256MB of the image per kernel launch
+GPU_MAX_HITS = 64 * 1024  # hit slots per signature per tile; a fuller tile is rescanned for that signature
+GPU_THREADS_PER_BLOCK = 256
+
+# One thread per haystack byte; matching threads claim a hit slot with an atomic counter
+SIGNATURE_MATCH_KERNEL = r"""
+extern "C" __global__
+void match_signature(const unsigned char *haystack, long long scan_length, long long length,
+                     const unsigned char *needle, int needle_length,
+                     long long *hits, unsigned int *hit_count, unsigned int max_hits)
+{
+    long long i = (long long)blockDim.x * blockIdx.x + threadIdx.x;
+    if (i >= scan_length || i + needle_length > length) return;
+    for (int j = 0; j < needle_length; j++) {
+        if (haystack[i + j] != needle[j]) return;
+    }
+    unsigned int slot = atomicAdd(hit_count, 1);
+    if (slot < max_hits) hits[slot] = i;
+}
+"""
+
+# Report cells are escaped with one C-level translate call each instead of html.escape
+HTML_ESCAPE_TABLE = str.maketrans({'<': '&lt;', '>': '&gt;', '&': '&amp;'})
+HTML_REPORT_HEADER = """<html>
+<head>
+    <title>QuantumForensix Analysis Report</title>
+    <style>
+        body { font-family: Arial, sans-serif; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { border: 1px solid #ddd; padding: 8px; }
+        th { background-color: #f2f2f2; }
+    </style>
+</head>
+<body>
+<h1>QuantumForensix Analysis Report</h1>
+"""
+
+IMAGE_SIGNATURES = {
+    'jpg': b'\xFF\xD8\xFF',
+    'png': b'\x89PNG\r\n\x1a\n',
+    'gif': b'GIF87a',
+    'bmp': b'BM',
+}
+DOC_SIGNATURES = {
+    'pdf': b'%PDF',
+    'docx': b'PK\x03\x04',
+    'xlsx': b'PK\x03\x04',
+    'pptx': b'PK\x03\x04',
+}
+AUDIO_SIGNATURES = {
+    'mp3': b'\xFF\xFB',
+    'wav': b'RIFF',
+    'flac': b'fLaC',
+}
+VIDEO_SIGNATURES = {
+    'mp4': b'ftyp',
+    'avi': b'RIFF',
+    'mkv': b'\x1A\x45\xDF\xA3',
+}
+SIGNATURE_GROUPS = {
+    'images': IMAGE_SIGNATURES,
+    'documents': DOC_SIGNATURES,
+    'audio': AUDIO_SIGNATURES,
+    'video': VIDEO_SIGNATURES,
+}
+
+
+def _drop_cached_image(image_path):
+    # Carving reads the image once; page cache advice is per file, so a fresh descriptor will do
+    if hasattr(os, 'posix_fadvise'):
+        fd = os.open(image_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def _cuda_available():
+    if cp is None:
+        return False
+    try:
+        return cp.cuda.runtime.getDeviceCount() > 0
+    except cp.cuda.runtime.CUDARuntimeError:
+        return False
+
+
+@cache
+def _signature_match_kernel():
+    return cp.RawKernel(SIGNATURE_MATCH_KERNEL, 'match_signature')
+
+
+class _GpuTileSlot:
+    # Pinned staging buffer, device tile and per-signature hit rows for one in-flight tile
+    def __init__(self, tile_size, signature_count):
+        self.tile_size = tile_size
+        self.signature_count = signature_count
+        self.stream = cp.cuda.Stream(non_blocking=True)
+        pinned = cp.cuda.alloc_pinned_memory(tile_size)
+        self.host_tile = np.frombuffer(pinned, dtype=np.uint8, count=tile_size)
+        self.device_tile = cp.empty(tile_size, dtype=cp.uint8)
+        self.hit_counts = cp.zeros(signature_count, dtype=cp.uint32)
+        self.device_hits = cp.empty((signature_count, GPU_MAX_HITS), dtype=cp.int64)
+        self.tile_start = 0
+        self.tile_length = 0
+        self.scan_length = 0
+
+
+def _rebase_yara_strings(strings, base):
+    # yara-python < 4.3 reports (offset, identifier, data) tuples, newer versions StringMatch objects
+    rebased = []
+    for string in strings:
+        if isinstance(string, tuple):
+            offset, identifier, matched_data = string
+            rebased.append((base + offset, identifier, matched_data))
+        else:
+            for instance in string.instances:
+                rebased.append((base + instance.offset, string.identifier, instance.matched_data))
+    return rebased
+
+
+def _match_yara_tile(rules, tile):
+    base, data = tile
+    matches = []
+
+    def yara_callback(match):
+        match['strings'] = _rebase_yara_strings(match['strings'], base)
+        matches.append(match)
+        return yara.CALLBACK_CONTINUE
 
-class QuantumForensix:
+    rules.match(data=data, callback=yara_callback, which_callbacks=yara.CALLBACK_MATCHES,
+                fast=True, timeout=YARA_SCAN_TIMEOUT)
+    return matches
+
+
+def _merge_yara_matches(tile_matches):
+    # A rule that fires in several tiles is reported once with the union of its string hits;
+    # hits inside a tile overlap are seen twice and kept once
+    merged = {}
+    for matches in tile_matches:
+        for match in matches:
+            key = (match['namespace'], match['rule'])
+            if key not in merged:
+                merged[key] = dict(match, strings=set())
+            merged[key]['strings'].update(match['strings'])
+
+    for match in merged.values():
+        match['strings'] = sorted(match['strings'])
+    return list(merged.values())
+
+
+def _write_carved_file(pending_write):
+    file_path, file_data = pending_write
+    fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        written = 0
+        while written < len(file_data):
+            written += os.write(fd, file_data[written:])
+    finally:
+        os.close(fd)
+
+
+def _escape_html(value) -> str:
+    return str(value).translate(HTML_ESCAPE_TABLE)
+
+
+def _write_html_row(output, first_cell_tag: str, *cells):
+    # Table rows in the report either lead with a <th> label or are all <td> cells
+    first, *rest = (_escape_html(cell) for cell in cells)
+    output.write(f"<tr><{first_cell_tag}>{first}</{first_cell_tag}>")
+    for cell in rest:
+        output.write(f"<td>{cell}</td>")
+    output.write("</tr>\n")
+
+
+class QuantumForensix(DiskImageAnalyzer):
     def __init__(self):
-        self.image = None
-        self.filesystem = None
+        super().__init__()
         self.os_type = platform.system().lower()
-        self.encryption_key = Fernet.generate_key()
-        self.fernet = Fernet(self.encryption_key)
+        self.encryption_key = AESGCM.generate_key(bit_length=256)
+        self._gpu_tile_slots = None
 
     # ... (previous methods remain the same)
 
     def recover_images(self, output_dir: str) -> List[str]:
         """Recover image files from the disk image."""
-        image_signatures = {
-            'jpg': b'\xFF\xD8\xFF',
-            'png': b'\x89PNG\r\n\x1a\n',
-            'gif': b'GIF87a',
-            'bmp': b'BM',
-        }
-        return self._recover_files_by_signatures(image_signatures, output_dir)
+        return self._recover_files_by_signatures(IMAGE_SIGNATURES, output_dir)
 
     def recover_documents(self, output_dir: str) -> List[str]:
         """Recover document files from the disk image."""
-        doc_signatures = {
-            'pdf': b'%PDF',
-            'docx': b'PK\x03\x04',
-            'xlsx': b'PK\x03\x04',
-            'pptx': b'PK\x03\x04',
-        }
-        return self._recover_files_by_signatures(doc_signatures, output_dir)
+        return self._recover_files_by_signatures(DOC_SIGNATURES, output_dir)
 
     def recover_audio(self, output_dir: str) -> List[str]:
         """Recover audio files from the disk image."""
-        audio_signatures = {
-            'mp3': b'\xFF\xFB',
-            'wav': b'RIFF',
-            'flac': b'fLaC',
-        }
-        return self._recover_files_by_signatures(audio_signatures, output_dir)
+        return self._recover_files_by_signatures(AUDIO_SIGNATURES, output_dir)
 
     def recover_video(self, output_dir: str) -> List[str]:
         """Recover video files from the disk image."""
-        video_signatures = {
-            'mp4': b'ftyp',
-            'avi': b'RIFF',
-            'mkv': b'\x1A\x45\xDF\xA3',
+        return self._recover_files_by_signatures(VIDEO_SIGNATURES, output_dir)
+
+    def recover_all_files(self, output_dir: str) -> Dict[str, List[str]]:
+        """Recover images, documents, audio and video from one signature scan of the disk image.
+
+        The scan is a single pass over the image when carve_scan is built or a CUDA device is used;
+        otherwise each distinct signature gets its own ``find`` pass.
+        """
+        signatures = {}
+        for group_signatures in SIGNATURE_GROUPS.values():
+            signatures.update(group_signatures)
+
+        recovered_files = self._recover_files_by_signatures(signatures, output_dir)
+        return {
+            group: [path for path in recovered_files if os.path.splitext(path)[1][1:] in group_signatures]
+            for group, group_signatures in SIGNATURE_GROUPS.items()
         }
-        return self._recover_files_by_signatures(video_signatures, output_dir)
 
     def _recover_files_by_signatures(self, signatures: Dict[str, bytes], output_dir: str) -> List[str]:
         recovered_files = []
+
+        # Several extensions can share a signature (PK\x03\x04, RIFF), each gets its own copy
+        extensions_by_signature = {}
         for file_ext, signature in signatures.items():
-            carved_files = self.file_carving(signature)
-            for i, file_data in enumerate(carved_files):
-                file_path = os.path.join(output_dir, f"recovered_{file_ext}_{i}.{file_ext}")
-                with open(file_path, 'wb') as f:
-                    f.write(file_data)
-                recovered_files.append(file_path)
+            extensions_by_signature.setdefault(signature, []).append(file_ext)
+        file_counts = dict.fromkeys(signatures, 0)
+
+        # Writes release the GIL, so creating the carved files concurrently overlaps the syscalls
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            # Each window carries enough of the following media to finish a file that starts in it
+            for _, media, scan_length in self._media_windows(overlap=CARVE_MAX_FILE_SIZE):
+                pending_writes = []
+                for offset, signature in self._find_signature_hits(media, signatures, scan_length):
+                    file_data = self._extract_carved_file(media, offset, signature)
+                    if file_data is None:
+                        continue
+                    for file_ext in extensions_by_signature[signature]:
+                        file_path = os.path.join(output_dir, f"recovered_{file_ext}_{file_counts[file_ext]}.{file_ext}")
+                        pending_writes.append((file_path, file_data))
+                        file_counts[file_ext] += 1
+                        recovered_files.append(file_path)
+
+                try:
+                    list(executor.map(_write_carved_file, pending_writes))
+                finally:
+                    for _, file_data in pending_writes:
+                        file_data.release()
+        # Once unmapped, the image's clean pages can leave the page cache
+        if self.image_path:
+            _drop_cached_image(self.image_path)
         return recovered_files
 
+    def _find_signature_hits(self, media, signatures: Dict[str, bytes], scan_length: int) -> List[Tuple[int, bytes]]:
+        # Only hits starting before scan_length belong to this window, the rest of it is overlap;
+        # signatures that share a prefix each report their own hits
+        if _cuda_available():
+            return self._find_signature_hits_gpu(media, set(signatures.values()), scan_length)
+        return find_signatures(media, sorted(set(signatures.values())), scan_length)
+
+    def file_carving_gpu(self, signatures: Dict[str, bytes]) -> List[bytes]:
+        """Carve files starting at any of the signatures, scanning on a CUDA device when one is present."""
+        carved_files = []
+        if not _cuda_available():
+            logger.info("No CUDA device available, carving on the CPU")
+        for _, media, scan_length in self._media_windows(overlap=CARVE_MAX_FILE_SIZE):
+            for offset, signature in self._find_signature_hits(media, signatures, scan_length):
+                carved_file = self._extract_carved_file(media, offset, signature)
+                if carved_file is not None:
+                    with carved_file:
+                        carved_files.append(bytes(carved_file))
+        return carved_files
+
+    def _find_signature_hits_gpu(self, media, signatures, scan_length) -> List[Tuple[int, bytes]]:
+        # Tiles alternate between two slots with their own stream, so staging and uploading one
+        # tile overlaps the kernels still scanning the previous one
+        kernel = _signature_match_kernel()
+        signatures = sorted(signatures)
+        overlap = max(len(signature) for signature in signatures) - 1
+        needles = [cp.asarray(np.frombuffer(signature, dtype=np.uint8)) for signature in signatures]
+        slots = self._reserve_gpu_tile_slots(min(GPU_TILE_SIZE, scan_length) + overlap, len(signatures))
+
+        hits = []
+        image = np.frombuffer(media, dtype=np.uint8)
+        for index, tile_start in enumerate(range(0, scan_length, GPU_TILE_SIZE)):
+            slot = slots[index % 2]
+            # A tile only needs the bytes that signatures starting in its scan range can reach
+            tile = image[tile_start:min(tile_start + GPU_TILE_SIZE, scan_length) + overlap]
+            slot.host_tile[:len(tile)] = tile
+            slot.tile_start, slot.tile_length = tile_start, len(tile)
+            slot.scan_length = min(GPU_TILE_SIZE, scan_length - tile_start)
+            del tile
+            self._launch_signature_tile(kernel, slot, signatures, needles)
+            if index:
+                self._collect_signature_tile(kernel, slots[(index - 1) % 2], signatures, needles, hits)
+        del image
+        self._collect_signature_tile(kernel, slots[index % 2], signatures, needles, hits)
+
+        hits.sort()
+        return hits
+
+    def _reserve_gpu_tile_slots(self, tile_size, signature_count):
+        # Slots are kept across windows and calls; pinned and device memory is only
+        # allocated again when a scan needs larger tiles or more hit rows
+        slots = self._gpu_tile_slots
+        if slots is None or slots[0].tile_size < tile_size or slots[0].signature_count < signature_count:
+            self._gpu_tile_slots = slots = None
+            self._gpu_tile_slots = slots = [_GpuTileSlot(tile_size, signature_count) for _ in range(2)]
+        return slots
+
+    def _launch_signature_tile(self, kernel, slot, signatures, needles):
+        blocks = (slot.scan_length + GPU_THREADS_PER_BLOCK - 1) // GPU_THREADS_PER_BLOCK
+        with slot.stream:
+            slot.device_tile[:slot.tile_length].set(slot.host_tile[:slot.tile_length], stream=slot.stream)
+            slot.hit_counts.fill(0)
+            # Every signature gets its own counter and hit row, so nothing syncs between launches
+            for row, (signature, needle) in enumerate(zip(signatures, needles)):
+                kernel((blocks,), (GPU_THREADS_PER_BLOCK,), (
+                    slot.device_tile, np.int64(slot.scan_length), np.int64(slot.tile_length),
+                    needle, np.int32(len(signature)),
+                    slot.device_hits[row], slot.hit_counts[row:row + 1], np.uint32(GPU_MAX_HITS),
+                ))
+
+    def _collect_signature_tile(self, kernel, slot, signatures, needles, hits):
+        slot.stream.synchronize()
+        counts = slot.hit_counts.get()
+        for row, (signature, needle) in enumerate(zip(signatures, needles)):
+            count = int(counts[row])
+            if count <= GPU_MAX_HITS:
+                offsets = slot.device_hits[row, :count].get()
+            else:
+                offsets = self._rescan_signature_tile(kernel, slot, signature, needle, count)
+            hits.extend((slot.tile_start + int(offset), signature) for offset in offsets)
+
+    def _rescan_signature_tile(self, kernel, slot, signature, needle, count):
+        # The hit row overflowed; scan the still-resident tile again with room for every hit
+        blocks = (slot.scan_length + GPU_THREADS_PER_BLOCK - 1) // GPU_THREADS_PER_BLOCK
+        with slot.stream:
+            device_hits = cp.empty(count, dtype=cp.int64)
+            hit_count = cp.zeros(1, dtype=cp.uint32)
+            kernel((blocks,), (GPU_THREADS_PER_BLOCK,), (
+                slot.device_tile, np.int64(slot.scan_length), np.int64(slot.tile_length),
+                needle, np.int32(len(signature)),
+                device_hits, hit_count, np.uint32(count),
+            ))
+        slot.stream.synchronize()
+        return device_hits.get()
+
     def secure_image(self, image_path: str) -> str:
-        """Encrypt the disk image for secure storage."""
-        with open(image_path, 'rb') as file:
-            encrypted_data = self.fernet.encrypt(file.read())
-        
+        r"""Encrypt the disk image for secure storage.
+
+        The image is sealed in ENCRYPTION_BLOCK_SIZE records with AES-256-GCM, so memory use
+        stays at one block. The output starts with a random 8-byte nonce prefix; each record's
+        nonce is that prefix plus a 4-byte big-endian record counter, and the final record is
+        authenticated with b'\x01' as associated data (b'\x00' otherwise) to detect truncation.
+        """
+        aesgcm = AESGCM(self.encryption_key)
+        nonce_prefix = os.urandom(8)
         secure_path = f"{image_path}.secure"
+        mm = self._map_image(image_path, require_raw=False)
+
         with open(secure_path, 'wb') as file:
-            file.write(encrypted_data)
-        
+            file.write(nonce_prefix)
+            if mm is None:
+                file.write(aesgcm.encrypt(nonce_prefix + (0).to_bytes(4, 'big'), b'', b'\x01'))
+                return secure_path
+
+            with mm, memoryview(mm) as view:
+                for index, offset in enumerate(range(0, len(view), ENCRYPTION_BLOCK_SIZE)):
+                    block = view[offset:offset + ENCRYPTION_BLOCK_SIZE]
+                    final = b'\x01' if offset + ENCRYPTION_BLOCK_SIZE >= len(view) else b'\x00'
+                    file.write(aesgcm.encrypt(nonce_prefix + index.to_bytes(4, 'big'), block, final))
+                    block.release()
+
         return secure_path
 
     def verify_image_integrity(self, image_path: str, original_hash: str) -> bool:
-        """Verify the integrity of the disk image."""
-        current_hash = self.calculate_hash(image_path)
+        """Verify the integrity of the disk image against a sequential or tree hash."""
+        # Always re-read the image: a cached digest would vouch for bytes that were never checked
+        if original_hash.startswith(TREE_HASH_PREFIX):
+            algorithm = original_hash[len(TREE_HASH_PREFIX):].split(':', 1)[0]
+            current_hash = self._tree_hash(image_path, algorithm)
+        else:
+            algorithm = DIGEST_ALGORITHMS.get(len(original_hash), 'sha256')
+            current_hash = self._sequential_hash(image_path, algorithm)
         return current_hash == original_hash
 
-    def detect_malware(self, yara_rules_path: str) -> List[Dict[str, Any]]:
-        """Scan the disk image for potential malware using YARA rules."""
+    def detect_malware(self, yara_rules_path: str, image_path: str = None,
+                       tile_size: int = YARA_TILE_SIZE) -> List[Dict[str, Any]]:
+        """Scan the disk image for potential malware using YARA rules.
+
+        The image is scanned in overlapping tiles of ``tile_size`` bytes on a thread pool, keeping
+        each scan's data and rule state cache-resident; string offsets are reported relative to the
+        image. Conditions on ``filesize`` or absolute offsets see one tile at a time, so pass
+        ``tile_size=None`` to scan the image as a single file instead. EWF images are always
+        scanned in tiles of their decompressed media, since the container file holds compressed
+        chunks. Either way each match's ``strings`` is a sorted list of ``(offset, identifier,
+        data)`` tuples.
+        """
+        image_path = self._resolve_image_path(image_path)
+        if not image_path:
+            return []
         rules = yara.compile(yara_rules_path)
-        matches = []
 
-        def yara_callback(data):
-            matches.append(data)
-            return yara.CALLBACK_CONTINUE
+        if tile_size is None and pyewf.check_file_signature(image_path):
+            logger.warning(f"{image_path} is an EWF container, scanning its media in {YARA_TILE_SIZE} byte tiles")
+            tile_size = YARA_TILE_SIZE
+
+        if tile_size is None:
+            matches = []
 
-        rules.match(data=self.image, callback=yara_callback)
-        return matches
+            def yara_callback(data):
+                data['strings'] = sorted(_rebase_yara_strings(data['strings'], 0))
+                matches.append(data)
+                return yara.CALLBACK_CONTINUE
 
-    def generate_report(self, output_path: str):
-        """Generate a comprehensive HTML report of the forensic analysis."""
+            # libyara maps the file itself instead of receiving a copy of the image from Python
+            rules.match(filepath=image_path, callback=yara_callback,
+                        which_callbacks=yara.CALLBACK_MATCHES, fast=True, timeout=YARA_SCAN_TIMEOUT)
+            return matches
+
+        tile_matches = []
+        # libyara releases the GIL while scanning, so tiles are matched in parallel; EWF media is
+        # decompressed one tile per worker at a time
+        with ThreadPoolExecutor(max_workers=YARA_MAX_THREADS) as executor:
+            for window_start, media, scan_length in self._media_windows(
+                    image_path, tile_size * YARA_MAX_THREADS, YARA_TILE_OVERLAP):
+                with memoryview(media) as view:
+                    tiles = [(window_start + offset, view[offset:offset + tile_size + YARA_TILE_OVERLAP])
+                             for offset in range(0, scan_length, tile_size)]
+                    try:
+                        tile_matches.extend(executor.map(partial(_match_yara_tile, rules), tiles))
+                    finally:
+                        for _, tile in tiles:
+                            tile.release()
+        return _merge_yara_matches(tile_matches)
+
+    def generate_report(self, output_path: str, image_hash: str = None):
+        """Generate a comprehensive HTML report of the forensic analysis.
+
+        Pass ``image_hash`` when the image has already been hashed to skip another full pass.
+        """
         report_data = {
             "image_info": {
                 "name": os.path.basename(self.image.name),
                 "size": self.image.get_size(),
-                "hash": self.calculate_hash(),
+                "hash": image_hash or self.calculate_hash(),
             },
             "file_system_info": self._get_fs_info(),
             "timeline": self.timeline_analysis(),
-            "recovered_files": {
-                "images": self.recover_images("recovered_files"),
-                "documents": self.recover_documents("recovered_files"),
-                "audio": self.recover_audio("recovered_files"),
-                "video": self.recover_video("recovered_files"),
-            },
+            "recovered_files": self.recover_all_files("recovered_files"),
             "malware_detections": self.detect_malware("path/to/yara_rules.yar"),
         }
 
-        html_content = self._generate_html_report(report_data)
         with open(output_path, 'w') as f:
-            f.write(html_content)
+            self._write_html_report(report_data, f)
 
     def _get_fs_info(self) -> Dict[str, Any]:
         """Get file system information."""
@@ -139,71 +495,42 @@ class QuantumForensix:
             "root_inum": fs_info.root_inum,
         }
 
-    def _generate_html_report(self, data: Dict[str, Any]) -> str:
-        """Generate HTML content for the report."""
-        # This is a simplified HTML generation. In a real-world scenario,
-        # you might want to use a templating engine like Jinja2.
-        html = f"""
-        <html>
-        <head>
-            <title>QuantumForensix Analysis Report</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; }}
-                table {{ border-collapse: collapse; width: 100%; }}
-                th, td {{ border: 1px solid #ddd; padding: 8px; }}
-                th {{ background-color: #f2f2f2; }}
-            </style>
-        </head>
-        <body>
-            <h1>QuantumForensix Analysis Report</h1>
-            <h2>Image Information</h2>
-            <table>
-                <tr><th>Name</th><td>{data['image_info']['name']}</td></tr>
-                <tr><th>Size</th><td>{data['image_info']['size']} bytes</td></tr>
-                <tr><th>Hash</th><td>{data['image_info']['hash']}</td></tr>
-            </table>
-            
-            <h2>File System Information</h2>
-            <table>
-                <tr><th>Type</th><td>{data['file_system_info']['type']}</td></tr>
-                <tr><th>Block Size</th><td>{data['file_system_info']['block_size']} bytes</td></tr>
-                <tr><th>Block Count</th><td>{data['file_system_info']['block_count']}</td></tr>
-                <tr><th>Root Inode</th><td>{data['file_system_info']['root_inum']}</td></tr>
-            </table>
-            
-            <h2>Recovered Files</h2>
-            <h3>Images</h3>
-            <ul>
-                {"".join(f"<li>{file}</li>" for file in data['recovered_files']['images'])}
-            </ul>
-            <h3>Documents</h3>
-            <ul>
-                {"".join(f"<li>{file}</li>" for file in data['recovered_files']['documents'])}
-            </ul>
-            <h3>Audio</h3>
-            <ul>
-                {"".join(f"<li>{file}</li>" for file in data['recovered_files']['audio'])}
-            </ul>
-            <h3>Video</h3>
-            <ul>
-                {"".join(f"<li>{file}</li>" for file in data['recovered_files']['video'])}
-            </ul>
-            
-            <h2>Malware Detections</h2>
-            <table>
-                <tr><th>Rule</th><th>Strings</th><th>Tags</th></tr>
-                {"".join(f"<tr><td>{m['rule']}</td><td>{m['strings']}</td><td>{m['tags']}</td></tr>" for m in data['malware_detections'])}
-            </table>
-            
-            <h2>Timeline</h2>
-            <table>
-                <tr><th>Timestamp</th><th>Action</th><th>File Path</th></tr>
-                {"".join(f"<tr><td>{t[0]}</td><td>{t[1]}</td><td>{t[2]}</td></tr>" for t in data['timeline'])}
-            </table>
-        </body>
-        </html>
-        """
-        return html
+    def _write_html_report(self, data: Dict[str, Any], output):
+        """Write the HTML report section by section to a text stream."""
+        image_info = data['image_info']
+        fs_info = data['file_system_info']
+
+        output.write(HTML_REPORT_HEADER)
+        output.write("<h2>Image Information</h2>\n<table>\n")
+        _write_html_row(output, "th", "Name", image_info['name'])
+        _write_html_row(output, "th", "Size", f"{image_info['size']} bytes")
+        _write_html_row(output, "th", "Hash", image_info['hash'])
+        output.write("</table>\n")
+
+        output.write("<h2>File System Information</h2>\n<table>\n")
+        _write_html_row(output, "th", "Type", fs_info['type'])
+        _write_html_row(output, "th", "Block Size", f"{fs_info['block_size']} bytes")
+        _write_html_row(output, "th", "Block Count", fs_info['block_count'])
+        _write_html_row(output, "th", "Root Inode", fs_info['root_inum'])
+        output.write("</table>\n")
+
+        output.write("<h2>Recovered Files</h2>\n")
+        for group, title in (("images", "Images"), ("documents", "Documents"), ("audio", "Audio"), ("video", "Video")):
+            output.write(f"<h3>{title}</h3>\n<ul>\n")
+            for file in data['recovered_files'][group]:
+                output.write(f"<li>{_escape_html(file)}</li>\n")
+            output.write("</ul>\n")
+
+        output.write("<h2>Malware Detections</h2>\n<table>\n<tr><th>Rule</th><th>Strings</th><th>Tags</th></tr>\n")
+        for m in data['malware_detections']:
+            _write_html_row(output, "td", m['rule'], m['strings'], m['tags'])
+        output.write("</table>\n")
+
+        output.write("<h2>Timeline</h2>\n<table>\n<tr><th>Timestamp</th><th>Action</th><th>File Path</th></tr>\n")
+        for t in data['timeline']:
+            _write_html_row(output, "td", t[0], t[1], t[2])
+        output.write("</table>\n</body>\n</html>\n")
+
 
 # Usage example
 forensix = QuantumForensix()
@@ -220,6 +547,6 @@ original_hash = forensix.calculate_hash('disk_image.E01')
 is_intact = forensix.verify_image_integrity('disk_image.E01', original_hash)
 print(f"Image integrity verified: {is_intact}")
 
-# Generate comprehensive report
-forensix.generate_report('forensic_report.html')
+# Generate comprehensive report, reusing the hash computed above
+forensix.generate_report('forensic_report.html', image_hash=original_hash)
 print("Forensic analysis report generated: forensic_report.html")
@@ -0,0 +1,329 @@
+/*
+ * carve_scan: byte scanners used by file carving.
+ *
+ *   find_jpeg_eoi   locate the JPEG end-of-image marker (FF D9) in a buffer
+ *   find_signature  locate a file signature, filtering candidates on its first
+ *                   and last byte before comparing the middle
+ *   find_signatures report every offset where any of several signatures starts,
+ *                   in one pass filtering candidates on their leading byte pair
+ *
+ * Loaded through ctypes by carving.py when present; without it the carver
+ * falls back to mmap.find. Build it next to the Python sources with:
+ *
+ *   gcc -O2 -shared -fPIC -o carve_scan.so carve_scan.c
+ *
+ * x86 builds pick the AVX2 loops at runtime when the CPU supports it, AArch64
+ * builds always use NEON, everything else uses the memchr-based scalar loops.
+ * Defining CARVE_SCAN_SCALAR_ONLY forces the scalar loops, which the tests use
+ * to check them on SIMD hosts.
+ */
+#include <stddef.h>
+#include <string.h>
+
+#if defined(_WIN32)
+#define EXPORT __declspec(dllexport)
+#else
+#define EXPORT
+#endif
+
+#define MAX_SIGNATURE_PAIRS 16  /* distinct leading byte pairs the SIMD filters compare */
+
+#if defined(CARVE_SCAN_SCALAR_ONLY)
+/* scalar loops only */
+#elif (defined(__x86_64__) || defined(__i386__)) && defined(__GNUC__)
+#define HAVE_AVX2_PATH 1
+#include <immintrin.h>
+#elif defined(__aarch64__)
+#define HAVE_NEON_PATH 1
+#include <arm_neon.h>
+#endif
+
+static long long find_scalar(const unsigned char *buf, size_t len, size_t start) {
+    const unsigned char *end = buf + len;
+    const unsigned char *p = buf + start;
+
+    while (p + 1 < end) {
+        p = memchr(p, 0xFF, (size_t)(end - p - 1));
+        if (!p) return -1;
+        if (p[1] == 0xD9) return (long long)(p - buf);
+        p++;
+    }
+    return -1;
+}
+
+/* The signatures of one find_signatures call and the filters built from them */
+struct signature_set {
+    const unsigned char *const *sigs;
+    const size_t *lens;
+    size_t count;
+    unsigned char first[256];
+    unsigned char pair_first[MAX_SIGNATURE_PAIRS];
+    unsigned char pair_second[MAX_SIGNATURE_PAIRS];
+    size_t pairs;  /* 0 when a signature is a single byte or there are too many pairs */
+};
+
+struct hit_buffer {
+    long long *offsets;
+    int *signatures;
+    size_t count;
+    size_t max;
+};
+
+static void build_signature_set(struct signature_set *set, const unsigned char *const *sigs,
+                                const size_t *lens, size_t count) {
+    int pairs_usable = 1;
+
+    set->sigs = sigs;
+    set->lens = lens;
+    set->count = count;
+    set->pairs = 0;
+    memset(set->first, 0, sizeof(set->first));
+    for (size_t s = 0; s < count; s++) {
+        size_t p;
+
+        set->first[sigs[s][0]] = 1;
+        if (lens[s] < 2) {
+            pairs_usable = 0;
+            continue;
+        }
+        for (p = 0; p < set->pairs; p++) {
+            if (set->pair_first[p] == sigs[s][0] && set->pair_second[p] == sigs[s][1]) break;
+        }
+        if (p < set->pairs) continue;
+        if (set->pairs == MAX_SIGNATURE_PAIRS) {
+            pairs_usable = 0;
+            continue;
+        }
+        set->pair_first[set->pairs] = sigs[s][0];
+        set->pair_second[set->pairs] = sigs[s][1];
+        set->pairs++;
+    }
+    if (!pairs_usable) set->pairs = 0;
+}
+
+/* Record every signature starting at pos; 0 when the hit buffer may not hold them all */
+static int record_hits(const struct signature_set *set, const unsigned char *buf, size_t len,
+                       size_t pos, struct hit_buffer *hits) {
+    if (hits->max - hits->count < set->count) return 0;
+    for (size_t s = 0; s < set->count; s++) {
+        if (set->lens[s] <= len - pos && memcmp(buf + pos, set->sigs[s], set->lens[s]) == 0) {
+            hits->offsets[hits->count] = (long long)pos;
+            hits->signatures[hits->count] = (int)s;
+            hits->count++;
+        }
+    }
+    return 1;
+}
+
+/* Each scan_signatures_* returns the position to resume from, end once [pos, end) is done */
+static size_t scan_signatures_scalar(const struct signature_set *set, const unsigned char *buf,
+                                     size_t len, size_t pos, size_t end, struct hit_buffer *hits) {
+    for (; pos < end; pos++) {
+        if (set->first[buf[pos]] && !record_hits(set, buf, len, pos, hits)) return pos;
+    }
+    return end;
+}
+
+static long long find_signature_scalar(const unsigned char *buf, size_t len, size_t start,
+                                       const unsigned char *sig, size_t sig_len) {
+    const unsigned char *p = buf + start;
+    const unsigned char *last = buf + len - sig_len;
+
+    while (p <= last) {
+        p = memchr(p, sig[0], (size_t)(last - p) + 1);
+        if (!p) return -1;
+        if (memcmp(p + 1, sig + 1, sig_len - 1) == 0) return (long long)(p - buf);
+        p++;
+    }
+    return -1;
+}
+
+#ifdef HAVE_AVX2_PATH
+__attribute__((target("avx2")))
+static long long find_avx2(const unsigned char *buf, size_t len) {
+    const __m256i ff = _mm256_set1_epi8((char)0xFF);
+    const __m256i d9 = _mm256_set1_epi8((char)0xD9);
+    size_t i = 0;
+
+    // Compare each byte with 0xFF and its successor with 0xD9, AND the masks
+    for (; i + 33 <= len; i += 32) {
+        __m256i cur = _mm256_loadu_si256((const __m256i *)(buf + i));
+        __m256i next = _mm256_loadu_si256((const __m256i *)(buf + i + 1));
+        unsigned int mask = (unsigned int)_mm256_movemask_epi8(
+            _mm256_and_si256(_mm256_cmpeq_epi8(cur, ff), _mm256_cmpeq_epi8(next, d9)));
+        if (mask) return (long long)(i + __builtin_ctz(mask));
+    }
+    return find_scalar(buf, len, i);
+}
+
+__attribute__((target("avx2")))
+static long long find_signature_avx2(const unsigned char *buf, size_t len,
+                                     const unsigned char *sig, size_t sig_len) {
+    const __m256i first = _mm256_set1_epi8((char)sig[0]);
+    const __m256i last = _mm256_set1_epi8((char)sig[sig_len - 1]);
+    size_t i = 0;
+
+    // Candidates must match the first byte here and the last byte sig_len - 1 further on
+    for (; i + sig_len - 1 + 32 <= len; i += 32) {
+        __m256i head = _mm256_loadu_si256((const __m256i *)(buf + i));
+        __m256i tail = _mm256_loadu_si256((const __m256i *)(buf + i + sig_len - 1));
+        unsigned int mask = (unsigned int)_mm256_movemask_epi8(
+            _mm256_and_si256(_mm256_cmpeq_epi8(head, first), _mm256_cmpeq_epi8(tail, last)));
+        while (mask) {
+            size_t candidate = i + __builtin_ctz(mask);
+            if (memcmp(buf + candidate + 1, sig + 1, sig_len - 2) == 0) return (long long)candidate;
+            mask &= mask - 1;
+        }
+    }
+    return find_signature_scalar(buf, len, i, sig, sig_len);
+}
+
+__attribute__((target("avx2")))
+static size_t scan_signatures_avx2(const struct signature_set *set, const unsigned char *buf,
+                                   size_t len, size_t pos, size_t end, struct hit_buffer *hits) {
+    __m256i first[MAX_SIGNATURE_PAIRS];
+    __m256i second[MAX_SIGNATURE_PAIRS];
+
+    for (size_t p = 0; p < set->pairs; p++) {
+        first[p] = _mm256_set1_epi8((char)set->pair_first[p]);
+        second[p] = _mm256_set1_epi8((char)set->pair_second[p]);
+    }
+    // Candidates match one of the leading byte pairs at i and i + 1
+    for (; pos + 32 <= end && pos + 33 <= len; pos += 32) {
+        __m256i cur = _mm256_loadu_si256((const __m256i *)(buf + pos));
+        __m256i next = _mm256_loadu_si256((const __m256i *)(buf + pos + 1));
+        __m256i any = _mm256_setzero_si256();
+        for (size_t p = 0; p < set->pairs; p++) {
+            any = _mm256_or_si256(any, _mm256_and_si256(_mm256_cmpeq_epi8(cur, first[p]),
+                                                        _mm256_cmpeq_epi8(next, second[p])));
+        }
+        unsigned int mask = (unsigned int)_mm256_movemask_epi8(any);
+        while (mask) {
+            size_t candidate = pos + __builtin_ctz(mask);
+            if (!record_hits(set, buf, len, candidate, hits)) return candidate;
+            mask &= mask - 1;
+        }
+    }
+    return scan_signatures_scalar(set, buf, len, pos, end, hits);
+}
+#endif
+
+#ifdef HAVE_NEON_PATH
+static long long find_neon(const unsigned char *buf, size_t len) {
+    const uint8x16_t ff = vdupq_n_u8(0xFF);
+    const uint8x16_t d9 = vdupq_n_u8(0xD9);
+    size_t i = 0;
+
+    for (; i + 17 <= len; i += 16) {
+        uint8x16_t hits = vandq_u8(vceqq_u8(vld1q_u8(buf + i), ff), vceqq_u8(vld1q_u8(buf + i + 1), d9));
+        if (vmaxvq_u8(hits)) {
+            // The marker starts inside this 16-byte block, pin down the lane
+            return find_scalar(buf, i + 17, i);
+        }
+    }
+    return find_scalar(buf, len, i);
+}
+
+static long long find_signature_neon(const unsigned char *buf, size_t len,
+                                     const unsigned char *sig, size_t sig_len) {
+    const uint8x16_t first = vdupq_n_u8(sig[0]);
+    const uint8x16_t last = vdupq_n_u8(sig[sig_len - 1]);
+    size_t i = 0;
+
+    for (; i + sig_len - 1 + 16 <= len; i += 16) {
+        uint8x16_t hits = vandq_u8(vceqq_u8(vld1q_u8(buf + i), first),
+                                   vceqq_u8(vld1q_u8(buf + i + sig_len - 1), last));
+        if (vmaxvq_u8(hits)) {
+            // A candidate starts inside this block, but it may still differ in the middle
+            long long found = find_signature_scalar(buf, i + 16 + sig_len - 1, i, sig, sig_len);
+            if (found >= 0) return found;
+        }
+    }
+    return find_signature_scalar(buf, len, i, sig, sig_len);
+}
+
+static size_t scan_signatures_neon(const struct signature_set *set, const unsigned char *buf,
+                                   size_t len, size_t pos, size_t end, struct hit_buffer *hits) {
+    uint8x16_t first[MAX_SIGNATURE_PAIRS];
+    uint8x16_t second[MAX_SIGNATURE_PAIRS];
+
+    for (size_t p = 0; p < set->pairs; p++) {
+        first[p] = vdupq_n_u8(set->pair_first[p]);
+        second[p] = vdupq_n_u8(set->pair_second[p]);
+    }
+    for (; pos + 16 <= end && pos + 17 <= len; pos += 16) {
+        uint8x16_t cur = vld1q_u8(buf + pos);
+        uint8x16_t next = vld1q_u8(buf + pos + 1);
+        uint8x16_t any = vdupq_n_u8(0);
+        for (size_t p = 0; p < set->pairs; p++) {
+            any = vorrq_u8(any, vandq_u8(vceqq_u8(cur, first[p]), vceqq_u8(next, second[p])));
+        }
+        if (vmaxvq_u8(any)) {
+            // A candidate starts inside this block, pin it down with the first-byte table
+            size_t resume = scan_signatures_scalar(set, buf, len, pos, pos + 16, hits);
+            if (resume < pos + 16) return resume;
+        }
+    }
+    return scan_signatures_scalar(set, buf, len, pos, end, hits);
+}
+#endif
+
+EXPORT long long find_jpeg_eoi(const unsigned char *buf, size_t len) {
+#if defined(HAVE_AVX2_PATH)
+    if (__builtin_cpu_supports("avx2")) {
+        return find_avx2(buf, len);
+    }
+#elif defined(HAVE_NEON_PATH)
+    return find_neon(buf, len);
+#endif
+    return find_scalar(buf, len, 0);
+}
+
+EXPORT long long find_signature(const unsigned char *buf, size_t len,
+                                const unsigned char *sig, size_t sig_len) {
+    // Callers handle signatures shorter than two bytes themselves
+    if (sig_len < 2 || len < sig_len) return -1;
+#if defined(HAVE_AVX2_PATH)
+    if (__builtin_cpu_supports("avx2")) {
+        return find_signature_avx2(buf, len, sig, sig_len);
+    }
+#elif defined(HAVE_NEON_PATH)
+    return find_signature_neon(buf, len, sig, sig_len);
+#endif
+    return find_signature_scalar(buf, len, 0, sig, sig_len);
+}
+
+/*
+ * Write (offset, signature index) for every signature starting in [start, end)
+ * to hit_offsets/hit_signatures, in offset order and then signature order.
+ * Signatures must be non-empty and max_hits at least count. The scan stops
+ * early when another offset's hits might not fit; *resume is where to call
+ * again, end once the range is done. Returns the number of hits written.
+ */
+EXPORT size_t find_signatures(const unsigned char *buf, size_t len, size_t start, size_t end,
+                              const unsigned char *const *sigs, const size_t *sig_lens, size_t count,
+                              long long *hit_offsets, int *hit_signatures, size_t max_hits,
+                              size_t *resume) {
+    struct signature_set set;
+    struct hit_buffer hits = {hit_offsets, hit_signatures, 0, max_hits};
+
+    if (end > len) end = len;
+    if (start >= end || count == 0) {
+        *resume = end;
+        return 0;
+    }
+    build_signature_set(&set, sigs, sig_lens, count);
+#if defined(HAVE_AVX2_PATH)
+    if (set.pairs && __builtin_cpu_supports("avx2")) {
+        *resume = scan_signatures_avx2(&set, buf, len, start, end, &hits);
+        return hits.count;
+    }
+#elif defined(HAVE_NEON_PATH)
+    if (set.pairs) {
+        *resume = scan_signatures_neon(&set, buf, len, start, end, &hits);
+        return hits.count;
+    }
+#endif
+    *resume = scan_signatures_scalar(&set, buf, len, start, end, &hits);
+    return hits.count;
+}
@@ -0,0 +1,129 @@
+"""Byte scans used by file carving, native when carve_scan.c has been built."""
+import os
+import ctypes
+from contextlib import contextmanager
+
+JPEG_EOI_MARKER = b'\xFF\xD9'
+CARVE_MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB max file size for this example
+SIGNATURE_HIT_BATCH = 4096  # hits collected per native find_signatures call
+
+
+def _load_carve_scan(library_path=None):
+    # Optional SIMD scanners built from carve_scan.c, see README for the build command
+    if library_path is None:
+        library_name = 'carve_scan.dll' if os.name == 'nt' else 'carve_scan.so'
+        library_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), library_name)
+    try:
+        library = ctypes.CDLL(library_path)
+    except OSError:
+        return None
+    library.find_jpeg_eoi.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    library.find_jpeg_eoi.restype = ctypes.c_longlong
+    library.find_signature.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_char_p, ctypes.c_size_t]
+    library.find_signature.restype = ctypes.c_longlong
+    library.find_signatures.argtypes = [
+        ctypes.c_void_p, ctypes.c_size_t, ctypes.c_size_t, ctypes.c_size_t,
+        ctypes.POINTER(ctypes.c_char_p), ctypes.POINTER(ctypes.c_size_t), ctypes.c_size_t,
+        ctypes.POINTER(ctypes.c_longlong), ctypes.POINTER(ctypes.c_int), ctypes.c_size_t,
+        ctypes.POINTER(ctypes.c_size_t),
+    ]
+    library.find_signatures.restype = ctypes.c_size_t
+    return library
+
+
+_carve_scan = _load_carve_scan()
+
+
+class _PyBuffer(ctypes.Structure):
+    # Py_buffer from the CPython C API
+    _fields_ = [
+        ('buf', ctypes.c_void_p),
+        ('obj', ctypes.c_void_p),
+        ('len', ctypes.c_ssize_t),
+        ('itemsize', ctypes.c_ssize_t),
+        ('readonly', ctypes.c_int),
+        ('ndim', ctypes.c_int),
+        ('format', ctypes.c_char_p),
+        ('shape', ctypes.POINTER(ctypes.c_ssize_t)),
+        ('strides', ctypes.POINTER(ctypes.c_ssize_t)),
+        ('suboffsets', ctypes.POINTER(ctypes.c_ssize_t)),
+        ('internal', ctypes.c_void_p),
+    ]
+
+
+ctypes.pythonapi.PyObject_GetBuffer.argtypes = [ctypes.py_object, ctypes.POINTER(_PyBuffer), ctypes.c_int]
+ctypes.pythonapi.PyObject_GetBuffer.restype = ctypes.c_int
+ctypes.pythonapi.PyBuffer_Release.argtypes = [ctypes.POINTER(_PyBuffer)]
+ctypes.pythonapi.PyBuffer_Release.restype = None
+
+
+@contextmanager
+def _buffer_address(obj):
+    # ctypes.from_buffer needs a writable buffer; the buffer protocol also exposes read-only
+    # mappings, and the export keeps the mapping from being closed while native code reads it
+    view = _PyBuffer()
+    ctypes.pythonapi.PyObject_GetBuffer(obj, ctypes.byref(view), 0)  # PyBUF_SIMPLE
+    try:
+        yield view.buf
+    finally:
+        ctypes.pythonapi.PyBuffer_Release(ctypes.byref(view))
+
+
+def find_jpeg_eoi(buffer, start, end):
+    """Offset of the first JPEG end marker starting in [start, end - 1), or -1; like ``find``."""
+    end = min(end, len(buffer))
+    if _carve_scan is None or end - start < 2:
+        return buffer.find(JPEG_EOI_MARKER, start, end)
+
+    with _buffer_address(buffer) as address:
+        index = _carve_scan.find_jpeg_eoi(address + start, end - start)
+    return -1 if index < 0 else start + index
+
+
+def find_signature(buffer, signature, start):
+    """Offset of the first ``signature`` at or after ``start``, or -1; like ``find``."""
+    if _carve_scan is None or len(signature) < 2 or len(buffer) - start < len(signature):
+        return buffer.find(signature, start)
+
+    with _buffer_address(buffer) as address:
+        index = _carve_scan.find_signature(address + start, len(buffer) - start, signature, len(signature))
+    return -1 if index < 0 else start + index
+
+
+def find_signatures(buffer, signatures, scan_length=None):
+    """``(offset, signature)`` for every signature starting before ``scan_length``, in offset order.
+
+    Signatures found at the same offset follow the order of ``signatures``. With carve_scan this
+    is one pass over ``buffer`` for all of them; without it each signature gets a ``find`` pass.
+    """
+    signatures = list(dict.fromkeys(signatures))
+    scan_length = len(buffer) if scan_length is None else min(scan_length, len(buffer))
+    if _carve_scan is None or not all(signatures):
+        hits = []
+        for index, signature in enumerate(signatures):
+            offset = buffer.find(signature, 0)
+            while offset != -1 and offset < scan_length:
+                hits.append((offset, index))
+                offset = buffer.find(signature, offset + 1)
+        hits.sort()
+        return [(offset, signatures[index]) for offset, index in hits]
+
+    count = len(signatures)
+    needles = (ctypes.c_char_p * count)(*signatures)
+    needle_lengths = (ctypes.c_size_t * count)(*map(len, signatures))
+    max_hits = max(SIGNATURE_HIT_BATCH, count)
+    hit_offsets = (ctypes.c_longlong * max_hits)()
+    hit_signatures = (ctypes.c_int * max_hits)()
+    resume = ctypes.c_size_t()
+
+    hits = []
+    position = 0
+    with _buffer_address(buffer) as address:
+        # The scan hands back a batch whenever the hit arrays fill up, then resumes where it stopped
+        while position < scan_length:
+            found = _carve_scan.find_signatures(address, len(buffer), position, scan_length,
+                                                needles, needle_lengths, count,
+                                                hit_offsets, hit_signatures, max_hits, ctypes.byref(resume))
+            hits.extend(zip(hit_offsets[:found], map(signatures.__getitem__, hit_signatures[:found])))
+            position = resume.value
+    return hits
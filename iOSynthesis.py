@@ -1,12 +1,17 @@
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <errno.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <pthread.h>
 #include <libimobiledevice/libimobiledevice.h>
 #include <libimobiledevice/lockdown.h>
 #include <libimobiledevice/afc.h>
 #include <plist/plist.h>
 
-#define AFC_MAX_PACKET_SIZE 4096
+#define AFC_MAX_PACKET_SIZE 65536
+#define COPY_RING_SLOTS 4
 
 typedef struct {
     char *path;
@@ -14,6 +19,26 @@ typedef struct {
     uint64_t mtime;
 } file_info_t;
 
+/* Packets read from AFC, handed from the reader thread to the writer */
+typedef struct {
+    char data[AFC_MAX_PACKET_SIZE];
+    uint32_t length;
+} copy_slot_t;
+
+typedef struct {
+    copy_slot_t slots[COPY_RING_SLOTS];
+    uint64_t handle;
+    int head;     /* next slot the reader fills */
+    int tail;     /* next slot the writer drains */
+    int count;    /* filled slots waiting to be written */
+    int done;     /* reader reached the end of the file or failed */
+    int failed;
+    int aborted;  /* writer gave up, reader should stop */
+    pthread_mutex_t lock;
+    pthread_cond_t not_empty;
+    pthread_cond_t not_full;
+} copy_ring_t;
+
 idevice_t device = NULL;
 lockdownd_client_t lockdown = NULL;
 afc_client_t afc = NULL;
@@ -73,10 +98,9 @@ int list_directory(const char *dir_path) {
     return 0;
 }
 
-int get_file_info(const char *file_path, file_info_t *info) {
+static int query_file_info(const char *file_path, file_info_t *info) {
     char **file_info = NULL;
     if (afc_get_file_info(afc, file_path, &file_info) != AFC_E_SUCCESS) {
-        printf("Error: Unable to get file info for %s\n", file_path);
         return -1;
     }
 
@@ -96,30 +120,164 @@ int get_file_info(const char *file_path, file_info_t *info) {
     return 0;
 }
 
+int get_file_info(const char *file_path, file_info_t *info) {
+    if (query_file_info(file_path, info) != 0) {
+        printf("Error: Unable to get file info for %s\n", file_path);
+        return -1;
+    }
+    return 0;
+}
+
+static void *afc_reader(void *arg) {
+    copy_ring_t *ring = arg;
+
+    for (;;) {
+        pthread_mutex_lock(&ring->lock);
+        while (ring->count == COPY_RING_SLOTS && !ring->aborted) {
+            pthread_cond_wait(&ring->not_full, &ring->lock);
+        }
+        if (ring->aborted) {
+            pthread_mutex_unlock(&ring->lock);
+            break;
+        }
+        copy_slot_t *slot = &ring->slots[ring->head];
+        pthread_mutex_unlock(&ring->lock);
+
+        // The head slot is not visible to the writer yet, so it can be filled unlocked
+        uint32_t bytes_read = 0;
+        afc_error_t err = afc_file_read(afc, ring->handle, slot->data, sizeof(slot->data), &bytes_read);
+
+        pthread_mutex_lock(&ring->lock);
+        if (err != AFC_E_SUCCESS || bytes_read == 0) {
+            ring->failed = (err != AFC_E_SUCCESS);
+            ring->done = 1;
+            pthread_cond_signal(&ring->not_empty);
+            pthread_mutex_unlock(&ring->lock);
+            break;
+        }
+        slot->length = bytes_read;
+        ring->head = (ring->head + 1) % COPY_RING_SLOTS;
+        ring->count++;
+        pthread_cond_signal(&ring->not_empty);
+        pthread_mutex_unlock(&ring->lock);
+    }
+    return NULL;
+}
+
+static int write_all(int fd, const char *data, size_t length) {
+    while (length > 0) {
+        ssize_t written = write(fd, data, length);
+        if (written < 0) {
+            if (errno == EINTR) continue;
+            return -1;
+        }
+        data += written;
+        length -= (size_t)written;
+    }
+    return 0;
+}
+
 int copy_file(const char *src_path, const char *dest_path) {
+    // The size only feeds the preallocation below, so a failed query stays quiet
+    file_info_t info = {0};
+    int have_info = query_file_info(src_path, &info) == 0;
+    if (have_info) free(info.path);
+
     uint64_t handle = 0;
     if (afc_file_open(afc, src_path, AFC_FOPEN_RDONLY, &handle) != AFC_E_SUCCESS) {
         printf("Error: Unable to open source file %s\n", src_path);
         return -1;
     }
 
-    FILE *dest_file = fopen(dest_path, "wb");
-    if (!dest_file) {
+    int dest_fd = open(dest_path, O_WRONLY | O_CREAT | O_TRUNC, 0644);
+    if (dest_fd < 0) {
         printf("Error: Unable to open destination file %s\n", dest_path);
         afc_file_close(afc, handle);
         return -1;
     }
 
-    char buffer[AFC_MAX_PACKET_SIZE];
-    uint32_t bytes_read = 0;
-    while (afc_file_read(afc, handle, buffer, sizeof(buffer), &bytes_read) == AFC_E_SUCCESS) {
-        if (bytes_read == 0) break;
-        fwrite(buffer, 1, bytes_read, dest_file);
+#if defined(__linux__)
+    // Reserve the whole file up front so the filesystem can lay it out contiguously
+    if (have_info && info.size > 0) {
+        posix_fallocate(dest_fd, 0, (off_t)info.size);
+    }
+#endif
+
+    copy_ring_t *ring = calloc(1, sizeof(*ring));
+    if (!ring) {
+        printf("Error: Unable to allocate copy buffers.\n");
+        close(dest_fd);
+        afc_file_close(afc, handle);
+        return -1;
+    }
+    ring->handle = handle;
+    pthread_mutex_init(&ring->lock, NULL);
+    pthread_cond_init(&ring->not_empty, NULL);
+    pthread_cond_init(&ring->not_full, NULL);
+
+    // A reader thread keeps USB transfers in flight while this thread writes to disk
+    int result = 0;
+    off_t total_written = 0;
+    pthread_t reader;
+    if (pthread_create(&reader, NULL, afc_reader, ring) != 0) {
+        printf("Error: Unable to start reader thread.\n");
+        result = -1;
+    } else {
+        for (;;) {
+            pthread_mutex_lock(&ring->lock);
+            while (ring->count == 0 && !ring->done) {
+                pthread_cond_wait(&ring->not_empty, &ring->lock);
+            }
+            if (ring->count == 0) {
+                if (ring->failed) {
+                    printf("Error: Unable to read source file %s\n", src_path);
+                    result = -1;
+                }
+                pthread_mutex_unlock(&ring->lock);
+                break;
+            }
+            copy_slot_t *slot = &ring->slots[ring->tail];
+            pthread_mutex_unlock(&ring->lock);
+
+            int write_failed = write_all(dest_fd, slot->data, slot->length) != 0;
+            total_written += slot->length;
+
+            pthread_mutex_lock(&ring->lock);
+            if (write_failed) {
+                ring->aborted = 1;
+            } else {
+                ring->tail = (ring->tail + 1) % COPY_RING_SLOTS;
+                ring->count--;
+            }
+            pthread_cond_signal(&ring->not_full);
+            pthread_mutex_unlock(&ring->lock);
+
+            if (write_failed) {
+                printf("Error: Unable to write destination file %s\n", dest_path);
+                result = -1;
+                break;
+            }
+        }
+        pthread_join(reader, NULL);
+    }
+
+    // Drop any preallocated tail if the device returned less than it reported
+    if (ftruncate(dest_fd, total_written) != 0) {
+        result = -1;
     }
+#if defined(POSIX_FADV_DONTNEED)
+    // The copy is not read back here, keep it from crowding out the page cache
+    fdatasync(dest_fd);
+    posix_fadvise(dest_fd, 0, 0, POSIX_FADV_DONTNEED);
+#endif
 
+    close(dest_fd);
     afc_file_close(afc, handle);
-    fclose(dest_file);
-    return 0;
+    pthread_cond_destroy(&ring->not_full);
+    pthread_cond_destroy(&ring->not_empty);
+    pthread_mutex_destroy(&ring->lock);
+    free(ring);
+    return result;
 }
 
 int main(int argc, char *argv[]) {
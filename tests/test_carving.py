@@ -0,0 +1,134 @@
+"""Check the carving scans, native and fallback, against mmap.find and a brute-force search.
+
+Run from the repository root with ``python -m unittest discover tests``.
+"""
+import os
+import sys
+import mmap
+import random
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import carving  # noqa: E402
+
+# A short alphabet built from the marker and signature bytes keeps near misses frequent
+ALPHABET = b'\xff\xd8\xd9\x00'
+# Every length around the 16/32-byte SIMD blocks, then a few longer buffers
+BUFFER_LENGTHS = list(range(0, 100)) + [127, 128, 129, 255, 256, 257, 1000]
+TRIALS_PER_LENGTH = 40
+
+
+def _build_library(directory, *flags):
+    compiler = os.environ.get('CC') or shutil.which('cc') or shutil.which('gcc')
+    if compiler is None:
+        raise unittest.SkipTest("no C compiler to build carve_scan.c")
+    library_path = os.path.join(directory, 'carve_scan_test.so')
+    subprocess.run([compiler, '-O2', '-shared', '-fPIC', *flags, '-o', library_path,
+                    os.path.join(REPO_ROOT, 'carve_scan.c')], check=True)
+    library = carving._load_carve_scan(library_path)
+    if library is None:
+        raise unittest.SkipTest("built carve_scan library could not be loaded")
+    return library
+
+
+def _mapped(data):
+    # Anonymous mappings cannot be empty; an empty bytes object behaves the same for find
+    if not data:
+        return data
+    mm = mmap.mmap(-1, len(data))
+    mm.write(data)
+    return mm
+
+
+def _all_hits(buffer, signatures, scan_length):
+    data = bytes(buffer)
+    return [(offset, signature) for offset in range(min(scan_length, len(data)))
+            for signature in dict.fromkeys(signatures) if data.startswith(signature, offset)]
+
+
+class FallbackScanTest(unittest.TestCase):
+    library_flags = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls._tmpdir = tempfile.TemporaryDirectory()
+        library = None if cls.library_flags is None else _build_library(cls._tmpdir.name, *cls.library_flags)
+        cls._patch = mock.patch.object(carving, '_carve_scan', library)
+        cls._patch.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._patch.stop()
+        cls._tmpdir.cleanup()
+
+    def _buffers(self, seed):
+        rng = random.Random(seed)
+        for length in BUFFER_LENGTHS:
+            for _ in range(TRIALS_PER_LENGTH):
+                yield rng, _mapped(bytes(rng.choice(ALPHABET) for _ in range(length)))
+
+    def test_find_signature_matches_mmap_find(self):
+        for rng, buffer in self._buffers(1):
+            signature = bytes(rng.choice(ALPHABET) for _ in range(rng.randint(1, 6)))
+            start = rng.randint(0, len(buffer) + 2)
+            with self.subTest(length=len(buffer), signature=signature, start=start):
+                self.assertEqual(carving.find_signature(buffer, signature, start), buffer.find(signature, start))
+
+    def test_find_jpeg_eoi_matches_mmap_find(self):
+        for rng, buffer in self._buffers(2):
+            start = rng.randint(0, len(buffer) + 2)
+            end = rng.randint(start, len(buffer) + 2)
+            with self.subTest(length=len(buffer), start=start, end=end):
+                self.assertEqual(carving.find_jpeg_eoi(buffer, start, end),
+                                 buffer.find(carving.JPEG_EOI_MARKER, start, min(end, len(buffer))))
+
+    def test_finds_every_hit_in_a_read_only_mapping(self):
+        data = bytes(random.Random(3).choice(ALPHABET) for _ in range(4096))
+        with tempfile.TemporaryFile() as image:
+            image.write(data)
+            image.flush()
+            with mmap.mmap(image.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                hits, offset = [], carving.find_signature(mm, b'\xff\xd8\xff', 0)
+                while offset != -1:
+                    hits.append(offset)
+                    offset = carving.find_signature(mm, b'\xff\xd8\xff', offset + 1)
+                self.assertEqual(hits, [i for i in range(len(data)) if data.startswith(b'\xff\xd8\xff', i)])
+
+    def test_find_signatures_matches_brute_force(self):
+        for rng, buffer in self._buffers(4):
+            signatures = [bytes(rng.choice(ALPHABET) for _ in range(rng.randint(1, 4)))
+                          for _ in range(rng.randint(1, 5))]
+            scan_length = rng.randint(0, len(buffer) + 2)
+            with self.subTest(length=len(buffer), signatures=signatures, scan_length=scan_length):
+                self.assertEqual(carving.find_signatures(buffer, signatures, scan_length),
+                                 _all_hits(buffer, signatures, scan_length))
+
+    def test_find_signatures_resumes_after_a_full_batch(self):
+        buffer = _mapped(b'\xff' * (carving.SIGNATURE_HIT_BATCH + 100))
+        signatures = [b'\xff\xff', b'\xff', b'\xff\xff\xff']
+        self.assertEqual(carving.find_signatures(buffer, signatures), _all_hits(buffer, signatures, len(buffer)))
+
+    def test_find_signatures_with_more_leading_byte_pairs_than_the_simd_filter(self):
+        rng = random.Random(5)
+        buffer = _mapped(bytes(rng.randrange(8) for _ in range(5000)))
+        signatures = [bytes((first, second, 7)) for first in range(5) for second in range(5)]
+        self.assertEqual(carving.find_signatures(buffer, signatures), _all_hits(buffer, signatures, len(buffer)))
+
+
+class NativeScanTest(FallbackScanTest):
+    # SIMD loops where the host has them (AVX2 on x86, NEON on AArch64)
+    library_flags = ()
+
+
+class NativeScalarScanTest(FallbackScanTest):
+    library_flags = ('-DCARVE_SCAN_SCALAR_ONLY',)
+
+
+if __name__ == '__main__':
+    unittest.main()